@@ -1,81 +1,535 @@
 import streamlit as st
-import anthropic
+import asyncio
 import json
-import PyPDF2
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from collections import OrderedDict
+import hashlib
 import io
+import os
 import re
+import shelve
+import threading
+
+# orjson parses model replies faster; its JSONDecodeError subclasses json's, so handlers are shared
+try:
+    import orjson as _json
+except ImportError:
+    _json = json
+
+MODEL = "claude-3-5-sonnet-20241022"
+# Bump whenever a prompt template or the cached result format changes so old answers are not reused
+PROMPT_VERSION = 3
+CACHE_DIR = ".cache"
+MAX_CONCURRENT_REQUESTS = 8
+STYLE_GUIDE_SUMMARY_CHARS = 300
+
+# Style guide section headers, matched over the whole document in one pass. The branches
+# are written so that no two adjacent repeats can match the same character, keeping a
+# failed match linear in the line length rather than quadratic.
+_HEADER_RE = re.compile(
+    r"^(?P<header>"
+    r"[^a-zA-Z\n]*[A-Z][^a-z\n]*"                                              # ALL CAPS line
+    r"|[^\n]*:[ \t\r]*"                                                        # line ending in a colon
+    r"|[ \t]*\d+(?:\.\d+)+\.?[ \t]+[A-Z][^\n]{0,60}?(?<![.!?,;])[ \t\r]*"  # dotted section number, e.g. "2.1 Tone"
+    r"|[ \t]*#+[ \t]+[^\n]*"                                                   # markdown heading
+    r")$",
+    re.MULTILINE,
+)
+
+# Structural characters of a JSON object, and the remainder of a string after its opening quote
+_JSON_STRUCT_RE = re.compile(r'[{}"]')
+_JSON_STRING_TAIL_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+# Serializes all PDFium calls in the process; see StyleGuideProcessor._iter_pdfium_pages
+_PDFIUM_LOCK = threading.Lock()
+
+def _extract_json(s: str) -> Optional[str]:
+    """Returns the first balanced {...} object in s, skipping braces inside JSON strings.
+
+    The regex engine jumps between structural characters and over whole strings, so the
+    Python loop runs once per brace or string rather than once per character.
+    """
+    start = s.find("{")
+    if start == -1:
+        return None
+    depth = 0
+    pos = start
+    while True:
+        match = _JSON_STRUCT_RE.search(s, pos)
+        if match is None:
+            return None
+        c = match.group()
+        pos = match.end()
+        if c == '"':
+            tail = _JSON_STRING_TAIL_RE.match(s, pos)
+            if tail is None:
+                return None
+            pos = tail.end()
+        elif c == "{":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return s[start:pos]
+
+class ResponseCache:
+    """Exact-match cache for API responses: in-process LRU backed by a shelve file on disk.
+
+    With path=None the cache is memory-only.
+    """
+    def __init__(self, path: Optional[str] = os.path.join(CACHE_DIR, "responses"), maxsize: int = 256):
+        self.path = path
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Builds a stable digest from the JSON-serializable request parts."""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached value for key, or None on a miss."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            if self.path is None:
+                return None
+            try:
+                with shelve.open(self.path) as db:
+                    value = db.get(key)
+            except Exception:
+                return None
+            if value is not None:
+                self._remember(key, value)
+            return value
+
+    def set(self, key: str, value) -> None:
+        """Stores value in both the memory and disk tiers."""
+        with self._lock:
+            self._remember(key, value)
+            if self.path is None:
+                return
+            try:
+                with shelve.open(self.path) as db:
+                    db[key] = value
+            except Exception:
+                pass
+
+    def _remember(self, key: str, value) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+class SemanticCache:
+    """Near-duplicate cache that matches texts by cosine similarity of sentence embeddings.
+
+    Embeddings come from sentence-transformers, loaded lazily on first use; if the package
+    is not installed the cache stays disabled and every lookup misses. Each namespace keeps
+    at most max_entries responses, evicting the oldest first, and at most max_namespaces
+    namespaces are kept, evicting the least recently used. Namespaces are scoped to the
+    embedding model, so vectors from different models are never compared.
+    """
+    # numpy is only needed by this optional cache, so it is imported on first use
+    _np = None
+
+    def __init__(self, path: str = os.path.join(CACHE_DIR, "semantic.npz"),
+                 model_name: str = "sentence-transformers/all-MiniLM-L6-v2", threshold: float = 0.92,
+                 max_entries: int = 256, max_namespaces: int = 32):
+        self.path = path
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_namespaces = max_namespaces
+        self._model = None
+        self._available = True
+        # model-scoped namespace -> (normalized embeddings of shape (N, dim), JSON responses), in LRU order
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._load()
+
+    @classmethod
+    def _numpy(cls):
+        if cls._np is None:
+            import numpy
+            cls._np = numpy
+        return cls._np
+
+    def embed(self, text: str) -> Optional["numpy.ndarray"]:
+        """Returns the unit-length embedding of text, or None if no embedding model is available."""
+        with self._lock:
+            if self._model is None and self._available:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+                except Exception:
+                    self._available = False
+            model = self._model
+        if model is None:
+            return None
+        np = self._numpy()
+        return np.asarray(model.encode(text, normalize_embeddings=True), dtype=np.float32)
+
+    def get(self, namespace: str, embedding: "numpy.ndarray") -> Optional[Dict]:
+        """Returns the response of the most similar cached text in namespace above the threshold."""
+        slot = self._slot(namespace)
+        with self._lock:
+            entry = self._entries.get(slot)
+            if entry is not None:
+                self._entries.move_to_end(slot)
+        if entry is None:
+            return None
+        matrix, responses = entry
+        if matrix.shape[1] != embedding.shape[0]:
+            return None
+        scores = matrix @ embedding
+        best = int(scores.argmax())
+        if scores[best] < self.threshold:
+            return None
+        return json.loads(responses[best])
+
+    def add(self, namespace: str, embedding: "numpy.ndarray", response: Dict) -> None:
+        """Stores response under embedding, evicting the namespace's oldest entries, and persists the cache."""
+        np = self._numpy()
+        slot = self._slot(namespace)
+        with self._lock:
+            matrix, responses = self._entries.get(slot, (None, []))
+            if matrix is None or matrix.shape[1] != embedding.shape[0]:
+                matrix, responses = np.empty((0, embedding.shape[0]), dtype=np.float32), []
+            matrix = np.vstack([matrix, embedding])[-self.max_entries:]
+            responses = (responses + [json.dumps(response)])[-self.max_entries:]
+            self._entries[slot] = (matrix, responses)
+            self._entries.move_to_end(slot)
+            while len(self._entries) > self.max_namespaces:
+                self._entries.popitem(last=False)
+            # Entries are replaced rather than mutated, so a shallow copy is a consistent snapshot
+            snapshot = OrderedDict(self._entries)
+        self._save(snapshot)
+
+    def _slot(self, namespace: str) -> str:
+        return f"{self.model_name}|{namespace}"
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with self._numpy().load(self.path, allow_pickle=False) as data:
+                # Namespaces are saved in LRU order, so the most recently used are at the end
+                namespaces = list(enumerate(data["namespaces"]))[-self.max_namespaces:]
+                for i, namespace in namespaces:
+                    matrix = data[f"emb_{i}"][-self.max_entries:]
+                    responses = [str(r) for r in data[f"resp_{i}"][-self.max_entries:]]
+                    self._entries[str(namespace)] = (matrix, responses)
+        except Exception:
+            self._entries = OrderedDict()
+
+    def _save(self, entries: Dict) -> None:
+        np = self._numpy()
+        arrays = {"namespaces": np.array(list(entries), dtype=str)}
+        for i, (matrix, responses) in enumerate(entries.values()):
+            arrays[f"emb_{i}"] = matrix
+            arrays[f"resp_{i}"] = np.array(responses, dtype=str)
+        tmp_path = self.path + ".tmp"
+        with self._save_lock:
+            try:
+                with open(tmp_path, "wb") as f:
+                    np.savez(f, **arrays)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                pass
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """Returns the response cache shared by all Streamlit sessions."""
+    return ResponseCache()
+
+@st.cache_resource
+def get_style_guide_cache() -> ResponseCache:
+    """Returns the parsed style guides shared by all Streamlit sessions, keyed by PDF digest."""
+    return ResponseCache(path=None, maxsize=32)
+
+@st.cache_resource
+def get_semantic_cache() -> SemanticCache:
+    """Returns the semantic cache shared by all Streamlit sessions."""
+    return SemanticCache()
 
 class StyleGuideProcessor:
     """Handles processing of PDF style guides and organizes content into sections."""
-    def __init__(self):
-        self.sections = {}
-        
-    def extract_pdf_text(self, pdf_file) -> str:
-        """Extracts text content from a PDF file."""
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        full_text = ""
-        
-        for page in pdf_reader.pages:
-            full_text += page.extract_text() + "\n"
-            
-        return full_text
+    # PDF backends are imported on first extraction to keep app start-up fast
+    _pdfium = None
+    _pypdf2 = None
+    
+    @classmethod
+    def _pdfium_module(cls):
+        if cls._pdfium is None:
+            import pypdfium2
+            cls._pdfium = pypdfium2
+        return cls._pdfium
+    
+    @classmethod
+    def _pypdf2_module(cls):
+        if cls._pypdf2 is None:
+            import PyPDF2
+            cls._pypdf2 = PyPDF2
+        return cls._pypdf2
     
-    def process_style_guide(self, text: str) -> Dict[str, str]:
-        """Organizes style guide text into sections based on headers."""
+    def process_style_guide(self, pdf_file, on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, str]:
+        """Organizes style guide text into sections based on headers, one page at a time.
+
+        on_progress is called with (page number, page count) after each page.
+        """
+        sections = {}
         current_section = "General"
-        sections = {"General": []}
         
-        for line in text.split('\n'):
-            if line.isupper() or line.strip().endswith(':'):
-                current_section = line.strip().rstrip(':')
-                sections[current_section] = []
-            else:
-                sections[current_section].append(line)
-                
+        for number, page_count, text in self.iter_pdf_pages(pdf_file):
+            current_section = self.add_to_sections(sections, text, current_section)
+            if on_progress:
+                on_progress(number, page_count)
+        
         return {k: '\n'.join(v) for k, v in sections.items()}
+    
+    def iter_pdf_pages(self, pdf_file) -> Iterator[Tuple[int, int, str]]:
+        """Yields (page number, page count, page text) for each page as it is extracted.
+
+        If PDFium fails at any point, extraction continues with PyPDF2 from the failed page.
+        """
+        pages_done = 0
+        try:
+            for page in self._iter_pdfium_pages(pdf_file):
+                yield page
+                pages_done += 1
+        except Exception:
+            pdf_file.seek(0)
+            yield from self._iter_pypdf2_pages(pdf_file, start=pages_done)
+    
+    def _iter_pdfium_pages(self, pdf_file) -> Iterator[Tuple[int, int, str]]:
+        # PDFium may only be entered by one thread at a time, even for different documents.
+        # Sessions run on separate threads, so every call holds the process-wide lock, which
+        # is released between pages so that long documents do not block other uploads.
+        pdfium = self._pdfium_module()
+        with _PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(pdf_file)
+        try:
+            with _PDFIUM_LOCK:
+                page_count = len(pdf)
+            for index in range(page_count):
+                with _PDFIUM_LOCK:
+                    page = pdf[index]
+                    textpage = page.get_textpage()
+                    text = textpage.get_text_bounded()
+                    textpage.close()
+                    page.close()
+                # PDFium ends lines with CRLF; sections, prompts and cache keys expect LF
+                yield index + 1, page_count, text.replace("\r\n", "\n")
+        finally:
+            with _PDFIUM_LOCK:
+                pdf.close()
+    
+    def _iter_pypdf2_pages(self, pdf_file, start: int = 0) -> Iterator[Tuple[int, int, str]]:
+        # Kept serial: pages share the reader's stream and extraction is pure Python under the GIL
+        pdf_reader = self._pypdf2_module().PdfReader(pdf_file)
+        page_count = len(pdf_reader.pages)
+        for index in range(start, page_count):
+            yield index + 1, page_count, pdf_reader.pages[index].extract_text()
+    
+    def add_to_sections(self, sections: Dict[str, List[str]], text: str, current_section: str = "General") -> str:
+        """Appends the body chunks in text to sections, continuing from current_section.
+
+        Returns the section that is still open at the end of text, so a document can be
+        processed a page at a time.
+        """
+        body_start = 0
+        
+        for match in _HEADER_RE.finditer(text):
+            # Body runs up to, but not including, the newline before the header line
+            body = text[body_start:max(body_start, match.start() - 1)]
+            if body:
+                sections.setdefault(current_section, []).append(body)
+            current_section = match.group("header").strip().lstrip('#').strip().rstrip(':')
+            sections.setdefault(current_section, [])
+            body_start = match.end() + 1
+        
+        body = text[body_start:]
+        if body:
+            sections.setdefault(current_section, []).append(body)
+        
+        return current_section
+
+def parse_style_guide(pdf_bytes: bytes, on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, str]:
+    """Extracts and sections a PDF style guide, reusing the result for identical bytes.
+
+    on_progress is called with (page number, page count) after each page, only when the guide
+    is actually parsed. The lookup is done by hand rather than with st.cache_data because
+    st.cache_data replays element calls made inside the cached function on later hits, and the
+    progress bar belongs to the caller.
+    """
+    cache = get_style_guide_cache()
+    key = ResponseCache.make_key("style_guide", hashlib.blake2b(pdf_bytes).hexdigest())
+    sections = cache.get(key)
+    if sections is None:
+        sections = StyleGuideProcessor().process_style_guide(io.BytesIO(pdf_bytes), on_progress)
+        cache.set(key, sections)
+    return sections
 
 class ContentFormatter:
     """Handles text formatting and cleaning for various content types."""
     @staticmethod
     def clean_text(text: str) -> str:
-        """Removes unwanted formatting and normalizes text output."""
-        if isinstance(text, (dict, list)):
-            text = str(text)
-            
-        # Remove any TextBlock formatting
-        text = text.replace('[TextBlock(text="', '')
-        text = text.replace('", type="text")]', '')
-        
-        # Replace escape characters with actual line breaks
-        text = text.replace('\\n', '\n')
-        text = text.replace('\\r', '\r')
-        
-        # Remove extra quotes and whitespace
-        text = text.strip('"\'')
-        
+        """Normalizes streamed text output by trimming surrounding whitespace."""
         return text.strip()
 
 class TextAnalyzer:
     """Main class for content analysis and generation."""
+    # The Anthropic SDK is imported once an API key is provided, not at app start-up
+    _anthropic = None
+
     def __init__(self, api_key: str):
         """Initializes the analyzer with necessary components."""
-        self.client = anthropic.Client(api_key=api_key)
-        self.style_guide = {}
+        self.api_key = api_key
+        # Semantic hits are fuzzy, so they are only shared between sessions using the same key
+        self._api_key_digest = hashlib.blake2b(api_key.encode(), digest_size=8).hexdigest()
+        self.client = self._anthropic_module().Client(api_key=api_key)
+        self._set_style_guide({})
+        self.style_guide_source = None
         self.formatter = ContentFormatter()
-        self.style_processor = StyleGuideProcessor()
+        self.cache = get_response_cache()
+        self.semantic_cache = get_semantic_cache()
     
-    def load_style_guide(self, pdf_file) -> Dict[str, str]:
-        """Loads and processes a PDF style guide."""
-        text = self.style_processor.extract_pdf_text(pdf_file)
-        self.style_guide = self.style_processor.process_style_guide(text)
+    @classmethod
+    def _anthropic_module(cls):
+        if cls._anthropic is None:
+            import anthropic
+            cls._anthropic = anthropic
+        return cls._anthropic
+    
+    def load_style_guide(self, pdf_file, on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, str]:
+        """Loads and processes a PDF style guide, reporting (page number, page count) to on_progress."""
+        pdf_bytes = pdf_file.getvalue() if hasattr(pdf_file, "getvalue") else pdf_file.read()
+        self._set_style_guide(parse_style_guide(pdf_bytes, on_progress))
+        self.style_guide_source = getattr(pdf_file, "file_id", None)
         return self.style_guide
+
+    def clear_style_guide(self) -> None:
+        """Removes the loaded style guide."""
+        self._set_style_guide({})
+        self.style_guide_source = None
+
+    def _set_style_guide(self, sections: Dict[str, str]) -> None:
+        """Stores the style guide along with its prompt context and the hash used in cache keys."""
+        self.style_guide = sections
+        self._style_guide_context = "\n".join(
+            f"{k}: {v[:STYLE_GUIDE_SUMMARY_CHARS]}..." for k, v in sections.items()
+        ) or "No style guide loaded."
+        self._style_guide_hash = ResponseCache.make_key(self._style_guide_context)
+        # The guide is the shared prefix of every request, so it is sent as a cacheable system block
+        self._system_prompt = [{
+            "type": "text",
+            "text": f"Style Guidelines:\n{self._style_guide_context}",
+            "cache_control": {"type": "ephemeral"},
+        }]
+
+    def _cached_call(self, key: str, fn: Callable):
+        """Returns the cached result for key, calling fn and caching its result on a miss.
+
+        fn may return None to signal a result that should not be cached.
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = fn()
+        if result is not None:
+            self.cache.set(key, result)
+        return result
+
+    def _lookup_analysis(self, text: str, content_type: str) -> Tuple[Optional[Dict], Optional[object]]:
+        """Checks the exact-match cache, then the semantic cache, for a prior analysis of text.
+
+        Returns (cached analysis or None, embedding of text or None); pass the embedding to
+        _store_analysis so a miss does not embed the text twice.
+        """
+        key = self._analysis_key(text, content_type)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, None
+        # Analysis is informational, so a prior answer for near-identical content is reusable;
+        # generation is a command and always goes to the API.
+        embedding = self.semantic_cache.embed(text)
+        if embedding is not None:
+            cached = self.semantic_cache.get(self._analysis_namespace(content_type), embedding)
+            if cached is not None:
+                self.cache.set(key, cached)
+        return cached, embedding
+
+    def _store_analysis(self, text: str, content_type: str, embedding, analysis: Dict) -> None:
+        """Stores a fresh analysis in the exact-match and semantic caches."""
+        self.cache.set(self._analysis_key(text, content_type), analysis)
+        if embedding is not None:
+            self.semantic_cache.add(self._analysis_namespace(content_type), embedding, analysis)
     
     def analyze_text(self, text: str, content_type: str) -> Dict:
         """Analyzes text content and provides structured feedback."""
-        style_guide_context = "\n".join([f"{k}: {v[:300]}..." for k, v in self.style_guide.items()]) if self.style_guide else "No style guide loaded."
+        try:
+            cached, embedding = self._lookup_analysis(text, content_type)
+            if cached is not None:
+                return cached
+            
+            analysis = self._request_analysis(self._build_analysis_prompt(text, content_type))
+            if analysis is None:
+                return self._fallback_analysis(text)
+            
+            self._store_analysis(text, content_type, embedding, analysis)
+            return analysis
+                
+        except Exception as e:
+            return self._error_analysis(e)
+    
+    def analyze_many(self, texts: List[str], content_type: str) -> List[Dict]:
+        """Analyzes several texts concurrently, returning one result per text in input order."""
+        return asyncio.run(self._analyze_many(texts, content_type))
+    
+    async def _analyze_many(self, texts: List[str], content_type: str) -> List[Dict]:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        client = self._anthropic_module().AsyncAnthropic(api_key=self.api_key)
         
-        prompt = f"""
+        async def analyze_one(text: str) -> Dict:
+            try:
+                # Cache I/O and embedding block, so they run in worker threads off the event loop
+                cached, embedding = await asyncio.to_thread(self._lookup_analysis, text, content_type)
+                if cached is not None:
+                    return cached
+                
+                prompt = self._build_analysis_prompt(text, content_type)
+                async with semaphore:
+                    response = await client.messages.create(**self._analysis_request(prompt))
+                analysis = self._parse_analysis(response)
+                if analysis is None:
+                    return self._fallback_analysis(text)
+                
+                await asyncio.to_thread(self._store_analysis, text, content_type, embedding, analysis)
+                return analysis
+            except Exception as e:
+                return self._error_analysis(e)
+        
+        try:
+            return await asyncio.gather(*(analyze_one(text) for text in texts))
+        finally:
+            await client.close()
+    
+    def _analysis_key(self, text: str, content_type: str) -> str:
+        return ResponseCache.make_key("analysis", content_type, text, self._style_guide_hash, 0, MODEL, PROMPT_VERSION)
+    
+    def _analysis_namespace(self, content_type: str) -> str:
+        return f"{content_type}:{self._style_guide_hash}:{MODEL}:{PROMPT_VERSION}:{self._api_key_digest}"
+    
+    def _build_analysis_prompt(self, text: str, content_type: str) -> str:
+        return f"""
         Analyze this {content_type} content and respond with ONLY a JSON object in the following structure:
         {{
             "overall_assessment": "A detailed evaluation of the overall content quality and effectiveness",
@@ -83,68 +537,88 @@ class TextAnalyzer:
             "suggestions": ["Specific suggestion 1", "Specific suggestion 2", "Specific suggestion 3"]
         }}
 
+        Follow the style guidelines provided in the system prompt.
+
         Content to analyze:
         {text}
 
-        Style Guidelines:
-        {style_guide_context}
-
         Remember: Respond with only the JSON object, no additional text or explanation.
         """
+    
+    def _analysis_request(self, prompt: str) -> Dict:
+        """Returns the messages.create arguments for an analysis prompt."""
+        return {
+            "model": MODEL,
+            "max_tokens": 1500,
+            "temperature": 0,
+            "system": self._system_prompt,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+    
+    def _request_analysis(self, prompt: str) -> Optional[Dict]:
+        """Sends an analysis prompt and parses the JSON reply, returning None if it cannot be parsed."""
+        response = self.client.messages.create(**self._analysis_request(prompt))
+        return self._parse_analysis(response)
+    
+    @staticmethod
+    def _parse_analysis(response) -> Optional[Dict]:
+        """Parses the JSON analysis from an API response, returning None if it cannot be parsed."""
+        response_text = "".join(block.text for block in response.content if getattr(block, "type", None) == "text")
         
+        # First attempt: direct JSON parsing
         try:
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1500,
-                temperature=0,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            response_text = str(response.content)
-            
-            # First attempt: direct JSON parsing
-            try:
-                return json.loads(response_text)
-            except json.JSONDecodeError:
-                # Second attempt: extract JSON using regex
+            analysis = _json.loads(response_text)
+        except json.JSONDecodeError:
+            # Second attempt: extract the first balanced JSON object
+            analysis = None
+            json_str = _extract_json(response_text)
+            if json_str:
                 try:
-                    json_pattern = r'\{[\s\S]*\}'
-                    json_match = re.search(json_pattern, response_text)
-                    if json_match:
-                        json_str = json_match.group()
-                        return json.loads(json_str)
-                except (json.JSONDecodeError, AttributeError):
+                    analysis = _json.loads(json_str)
+                except json.JSONDecodeError:
                     pass
-            
-            # Fallback response
-            return {
-                "overall_assessment": "Analysis completed with formatting issues.",
-                "style_evaluation": f"Content analyzed: {text[:100]}...",
-                "suggestions": [
-                    "Consider reviewing the content for clarity",
-                    "Ensure all key points are clearly communicated",
-                    "Review formatting and structure"
-                ]
-            }
-                
-        except Exception as e:
-            return {
-                "overall_assessment": f"Analysis error: {str(e)}",
-                "style_evaluation": "Unable to complete style evaluation",
-                "suggestions": [
-                    "Please try again in a moment",
-                    "Consider breaking content into smaller sections"
-                ]
-            }
-    
-    def generate_text(self, prompt: str, content_type: str) -> str:
-        """Generates new content based on prompt and content type."""
-        style_guide_context = "\n".join([f"{k}: {v[:300]}..." for k, v in self.style_guide.items()]) if self.style_guide else "No style guide loaded."
         
+        # Any JSON value parses, but only the requested object shape can be rendered and cached
+        if (isinstance(analysis, dict)
+                and isinstance(analysis.get("overall_assessment"), str)
+                and isinstance(analysis.get("style_evaluation"), str)
+                and isinstance(analysis.get("suggestions"), list)):
+            return analysis
+        return None
+    
+    @staticmethod
+    def _fallback_analysis(text: str) -> Dict:
+        """Returns a placeholder analysis for replies that could not be parsed."""
+        return {
+            "overall_assessment": "Analysis completed with formatting issues.",
+            "style_evaluation": f"Content analyzed: {text[:100]}...",
+            "suggestions": [
+                "Consider reviewing the content for clarity",
+                "Ensure all key points are clearly communicated",
+                "Review formatting and structure"
+            ]
+        }
+    
+    @staticmethod
+    def _error_analysis(error: Exception) -> Dict:
+        """Returns a placeholder analysis for failed requests."""
+        return {
+            "overall_assessment": f"Analysis error: {str(error)}",
+            "style_evaluation": "Unable to complete style evaluation",
+            "suggestions": [
+                "Please try again in a moment",
+                "Consider breaking content into smaller sections"
+            ]
+        }
+    
+    def generate_text(self, prompt: str, content_type: str, temperature: float = 0.7,
+                      on_text: Optional[Callable[[str], None]] = None) -> str:
+        """Generates new content based on prompt and content type.
+
+        If on_text is given, it is called with the accumulated text as the response streams in.
+        """
         generation_prompt = f"""
-        Generate {content_type} content following these guidelines:
-        
-        {style_guide_context}
+        Generate {content_type} content following the style guidelines provided in the system prompt.
         
         Requirements:
         - Professional and clear writing style
@@ -156,19 +630,34 @@ class TextAnalyzer:
         """
         
         try:
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1500,
-                temperature=0.7,
-                messages=[{"role": "user", "content": generation_prompt}]
-            )
-            
-            return self.formatter.clean_text(response.content)
+            # Sampled output is only reproducible, and therefore cacheable, at temperature 0
+            if temperature == 0:
+                key = ResponseCache.make_key("generation", content_type, prompt, self._style_guide_hash, temperature, MODEL, PROMPT_VERSION)
+                return self._cached_call(key, lambda: self._request_generation(generation_prompt, temperature, on_text))
+            return self._request_generation(generation_prompt, temperature, on_text)
             
         except Exception as e:
             st.error(f"Generation error: {str(e)}")
             return "Content generation failed. Please try again."
 
+    def _request_generation(self, generation_prompt: str, temperature: float,
+                            on_text: Optional[Callable[[str], None]] = None) -> str:
+        """Streams a generation prompt and returns the cleaned text."""
+        accum = ""
+        with self.client.messages.stream(
+            model=MODEL,
+            max_tokens=1500,
+            temperature=temperature,
+            system=self._system_prompt,
+            messages=[{"role": "user", "content": generation_prompt}]
+        ) as stream:
+            for text in stream.text_stream:
+                accum += text
+                if on_text:
+                    on_text(accum)
+        
+        return self.formatter.clean_text(accum)
+
 def create_sidebar(analyzer: TextAnalyzer) -> tuple:
     """Creates the sidebar navigation and controls."""
     st.sidebar.title("Navigation")
@@ -178,12 +667,32 @@ def create_sidebar(analyzer: TextAnalyzer) -> tuple:
     uploaded_file = st.sidebar.file_uploader("Upload Style Guide (PDF)", type="pdf")
     
     if uploaded_file:
-        with st.spinner("Processing style guide..."):
+        # (file_id, message) of the last upload that failed, so it is not re-parsed on every rerun
+        failed = st.session_state.get("style_guide_error")
+        if failed is not None and failed[0] == uploaded_file.file_id:
+            st.sidebar.error(failed[1])
+        elif uploaded_file.file_id != analyzer.style_guide_source:
+            progress = st.sidebar.progress(0.0, text="Processing style guide...")
             try:
-                sections = analyzer.load_style_guide(uploaded_file)
-                st.sidebar.success("Style guide loaded successfully!")
+                analyzer.load_style_guide(
+                    uploaded_file,
+                    on_progress=lambda number, count: progress.progress(number / count, text=f"Processing page {number} of {count}...")
+                )
+                st.session_state.pop("style_guide_error", None)
             except Exception as e:
-                st.sidebar.error(f"Error loading style guide: {str(e)}")
+                # Don't keep analyzing against the guide this upload was meant to replace
+                analyzer.clear_style_guide()
+                message = f"Error loading style guide: {str(e)}"
+                st.session_state.style_guide_error = (uploaded_file.file_id, message)
+                st.sidebar.error(message)
+            finally:
+                progress.empty()
+        if uploaded_file.file_id == analyzer.style_guide_source:
+            st.sidebar.success("Style guide loaded successfully!")
+    else:
+        st.session_state.pop("style_guide_error", None)
+        if analyzer.style_guide_source is not None:
+            analyzer.clear_style_guide()
     
     page = st.sidebar.radio("Choose a tool:", 
                            ["Content Generation", "Content Analysis"])
@@ -209,7 +718,9 @@ def render_generation_page(analyzer: TextAnalyzer, content_type: str):
     if st.button("Generate Content"):
         with st.spinner("Generating..."):
             try:
-                generated_content = analyzer.generate_text(prompt, content_type)
+                placeholder = st.empty()
+                generated_content = analyzer.generate_text(prompt, content_type, on_text=placeholder.markdown)
+                placeholder.empty()
                 st.text_area(
                     "Generated Content (Copy-Paste Ready):",
                     value=generated_content,
@@ -228,28 +739,43 @@ def render_analysis_page(analyzer: TextAnalyzer, content_type: str):
         height=200
     )
     
+    analyze_multiple = st.checkbox(
+        "Analyze multiple documents",
+        help="Separate documents with a line containing only ---"
+    )
+    
     if st.button("Analyze Content"):
         with st.spinner("Analyzing..."):
             try:
-                analysis = analyzer.analyze_text(text_to_analyze, content_type)
-                
-                tab1, tab2, tab3 = st.tabs(["Overview", "Detailed Analysis", "Suggestions"])
-                
-                with tab1:
-                    st.subheader("Overall Assessment")
-                    st.write(analysis["overall_assessment"])
-                    
-                with tab2:
-                    st.subheader("Style and Tone")
-                    st.write(analysis["style_evaluation"])
-                    
-                with tab3:
-                    st.subheader("Improvement Suggestions")
-                    for suggestion in analysis["suggestions"]:
-                        st.write(f"• {suggestion}")
+                if analyze_multiple:
+                    documents = [doc.strip() for doc in re.split(r"^\s*---\s*$", text_to_analyze, flags=re.MULTILINE)]
+                    documents = [doc for doc in documents if doc]
+                    analyses = analyzer.analyze_many(documents, content_type)
+                    for i, (document, analysis) in enumerate(zip(documents, analyses), start=1):
+                        with st.expander(f"Document {i}: {document[:60]}", expanded=i == 1):
+                            render_analysis(analysis)
+                else:
+                    render_analysis(analyzer.analyze_text(text_to_analyze, content_type))
             except Exception as e:
                 st.error(f"An error occurred during analysis: {str(e)}")
 
+def render_analysis(analysis: Dict):
+    """Renders a single analysis result as tabs."""
+    tab1, tab2, tab3 = st.tabs(["Overview", "Detailed Analysis", "Suggestions"])
+    
+    with tab1:
+        st.subheader("Overall Assessment")
+        st.write(analysis["overall_assessment"])
+        
+    with tab2:
+        st.subheader("Style and Tone")
+        st.write(analysis["style_evaluation"])
+        
+    with tab3:
+        st.subheader("Improvement Suggestions")
+        for suggestion in analysis["suggestions"]:
+            st.write(f"• {suggestion}")
+
 def main():
     """Main application entry point."""
     st.title("Professional Content Tool")
@@ -262,7 +788,11 @@ def main():
         return
     
     try:
-        analyzer = TextAnalyzer(api_key)
+        # Keep the analyzer, its API client and loaded style guide alive across reruns
+        if "analyzer" not in st.session_state or st.session_state.api_key != api_key:
+            st.session_state.analyzer = TextAnalyzer(api_key)
+            st.session_state.api_key = api_key
+        analyzer = st.session_state.analyzer
         
         # Create sidebar navigation with analyzer instance
         page, content_type = create_sidebar(analyzer)
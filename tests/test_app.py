@@ -0,0 +1,293 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamlit.testing.v1 import AppTest
+
+import app
+from app import ResponseCache, SemanticCache, StyleGuideProcessor, TextAnalyzer
+
+
+def _make_pdf(pages):
+    """Builds a minimal PDF with one Helvetica text line per input line."""
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: ("<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{i} 0 R" for i in page_ids), len(pages))).encode(),
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for page_id, text in zip(page_ids, pages):
+        stream = "BT /F1 12 Tf 14 TL 72 720 Td " + " ".join(f"({line}) Tj T*" for line in text.split("\n")) + " ET"
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode()
+        objects[page_id + 1] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode()
+    out = b"%PDF-1.4\n"
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += f"{number} 0 obj\n".encode() + objects[number] + b"\nendobj\n"
+    xref = len(out)
+    size = max(objects) + 1
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offsets[n]:010d} 00000 n \n".encode() for n in range(1, size))
+    out += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def _sections(text):
+    sections = {}
+    StyleGuideProcessor().add_to_sections(sections, text)
+    return {k: "\n".join(v) for k, v in sections.items()}
+
+
+def _load_style_guide_app():
+    import io
+
+    import streamlit as st
+
+    from app import TextAnalyzer
+
+    # A fresh analyzer per run, as after an API key change, forces a reload of the same bytes
+    analyzer = TextAnalyzer("test-key")
+    progress = st.sidebar.progress(0.0)
+    st.session_state.sections = analyzer.load_style_guide(
+        io.BytesIO(st.session_state.pdf_bytes),
+        on_progress=lambda number, count: progress.progress(number / count)
+    )
+
+
+class _FakeMessages:
+    """Stands in for client.messages, answering each request with reply(kwargs)."""
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        text = self.reply(kwargs)
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)])
+
+    def stream(self, **kwargs):
+        self.calls.append(kwargs)
+        text = self.reply(kwargs)
+        return contextlib.nullcontext(SimpleNamespace(text_stream=[text[:3], text[3:]]))
+
+
+class _FakeAsyncMessages:
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def create(self, **kwargs):
+        return self.messages.create(**kwargs)
+
+
+class _FakeAsyncClient:
+    def __init__(self, messages):
+        self.messages = _FakeAsyncMessages(messages)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def make_analyzer(tmp_path, monkeypatch):
+    """Returns a factory for analyzers backed by a fake API client and private caches."""
+    monkeypatch.chdir(tmp_path)
+
+    def make(reply):
+        messages = _FakeMessages(reply)
+        monkeypatch.setattr(TextAnalyzer, "_anthropic", SimpleNamespace(
+            Client=lambda api_key: SimpleNamespace(messages=messages),
+            AsyncAnthropic=lambda api_key: _FakeAsyncClient(messages),
+        ))
+        analyzer = TextAnalyzer("test-key")
+        analyzer.cache = ResponseCache(path=str(tmp_path / "responses"))
+        analyzer.semantic_cache = SemanticCache(path=str(tmp_path / "semantic.npz"))
+        analyzer.semantic_cache._available = False
+        return analyzer, messages
+
+    return make
+
+
+_ANALYSIS = {"overall_assessment": "Good", "style_evaluation": "Clear", "suggestions": []}
+
+
+def test_numbered_rules_stay_in_their_section():
+    text = (
+        "WRITING RULES\n"
+        "1. Use active voice.\n"
+        "2. Avoid jargon where possible.\n"
+        "10. Never use exclamation marks in customer correspondence.\n"
+        "TONE\n"
+        "Be warm and direct.\n"
+    )
+    sections = _sections(text)
+    assert sections["WRITING RULES"] == (
+        "1. Use active voice.\n"
+        "2. Avoid jargon where possible.\n"
+        "10. Never use exclamation marks in customer correspondence."
+    )
+    assert sections["TONE"] == "Be warm and direct.\n"
+
+
+def test_dotted_section_numbers_and_header_only_sections():
+    sections = _sections("2.1 Tone\nBe nice.\nCLOSINGS\n2.2 Sign-offs\nRegards")
+    assert sections == {"2.1 Tone": "Be nice.", "CLOSINGS": "", "2.2 Sign-offs": "Regards"}
+
+
+def test_header_scan_is_linear_on_long_caps_lines():
+    def scan_time(width):
+        text = ("A " * width + "a\n") * 5
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            _sections(text)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    # 16x longer lines cost about 16x in a linear scan and 256x with quadratic backtracking,
+    # so comparing the two sizes does not depend on how fast the machine is
+    assert scan_time(32000) < 64 * scan_time(2000)
+
+
+def test_loading_the_same_style_guide_twice(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    at = AppTest.from_function(_load_style_guide_app)
+    at.session_state.pdf_bytes = _make_pdf(["Intro text\nTONE\nBe warm.", "Stay calm.\nFORMATTING\nUse lists."])
+
+    at.run()
+    assert not at.exception
+    first = at.session_state.sections
+
+    at.run()
+    assert not at.exception
+    assert at.session_state.sections == first
+    assert first["TONE"].split() == ["Be", "warm.", "Stay", "calm."]
+    assert first["FORMATTING"].strip() == "Use lists."
+
+
+def test_pdfium_failure_mid_document_continues_with_pypdf2(monkeypatch):
+    def failing_pdfium_pages(self, pdf_file):
+        yield 1, 2, "FROM PDFIUM"
+        raise RuntimeError("page extraction failed")
+
+    monkeypatch.setattr(StyleGuideProcessor, "_iter_pdfium_pages", failing_pdfium_pages)
+    pdf = io.BytesIO(_make_pdf(["First page", "Second page"]))
+    pages = list(StyleGuideProcessor().iter_pdf_pages(pdf))
+    assert [(number, count) for number, count, _ in pages] == [(1, 2), (2, 2)]
+    assert pages[0][2] == "FROM PDFIUM"
+    assert pages[1][2].strip() == "Second page"
+
+
+@pytest.mark.parametrize("reply", ['"just a string"', "[1, 2]", '{"overall_assessment": "Good"}'])
+def test_malformed_analysis_falls_back_and_is_not_cached(make_analyzer, reply):
+    analyzer, messages = make_analyzer(lambda kwargs: reply)
+    first = analyzer.analyze_text("Some text", "Email")
+    assert first == TextAnalyzer._fallback_analysis("Some text")
+    analyzer.analyze_text("Some text", "Email")
+    assert len(messages.calls) == 2
+
+
+def test_semantic_cache_scopes_by_model_and_evicts_old_namespaces(tmp_path):
+    import numpy as np
+
+    path = str(tmp_path / "semantic.npz")
+    embedding = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    cache = SemanticCache(path=path, max_namespaces=2)
+    for namespace in ("a", "b", "c"):
+        cache.add(namespace, embedding, {"namespace": namespace})
+    assert cache.get("a", embedding) is None
+    assert cache.get("c", embedding) == {"namespace": "c"}
+
+    reloaded = SemanticCache(path=path, max_namespaces=2)
+    assert reloaded.get("b", embedding) == {"namespace": "b"}
+    assert reloaded.get("b", np.ones(5, dtype=np.float32)) is None
+    assert SemanticCache(path=path, model_name="other-model").get("b", embedding) is None
+
+
+def test_pdfium_pages_from_concurrent_threads_use_lf_line_endings():
+    from concurrent.futures import ThreadPoolExecutor
+
+    pdf_bytes = _make_pdf(["TONE\nBe warm.", "FORMATTING\nUse lists."])
+
+    def extract(_):
+        return [text for _, _, text in StyleGuideProcessor()._iter_pdfium_pages(io.BytesIO(pdf_bytes))]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(extract, range(32)))
+    assert all(pages == results[0] for pages in results)
+    assert results[0][0].split("\n") == ["TONE", "Be warm."]
+    assert "\r" not in "".join(results[0])
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('Sure: {"a": "}{"} done', '{"a": "}{"}'),
+    ('{"a": "say \\"}\\" now", "b": {}}', '{"a": "say \\"}\\" now", "b": {}}'),
+    ('{"a": 1} and then {"b": 2}', '{"a": 1}'),
+    ('{"a": "never closed}', None),
+    ('{"a": {"b": 1}', None),
+    ("no object here", None),
+])
+def test_extract_json(text, expected):
+    assert app._extract_json(text) == expected
+
+
+def test_response_cache_evicts_least_recently_used_and_persists(tmp_path):
+    path = str(tmp_path / "responses")
+    cache = ResponseCache(path=path, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.get("b") == 2
+    assert ResponseCache(path=path).get("c") == 3
+    assert ResponseCache(path=None).get("c") is None
+    assert ResponseCache.make_key("x", 1) == ResponseCache.make_key("x", 1) != ResponseCache.make_key("x", 2)
+
+
+def test_cached_analysis_skips_the_client(make_analyzer):
+    analyzer, messages = make_analyzer(lambda kwargs: "Here you go:\n" + json.dumps(_ANALYSIS))
+    assert analyzer.analyze_text("Some text", "Email") == _ANALYSIS
+    assert analyzer.analyze_text("Some text", "Email") == _ANALYSIS
+    assert analyzer.analyze_many(["Some text"], "Email") == [_ANALYSIS]
+    assert len(messages.calls) == 1
+    analyzer.analyze_text("Some text", "Marketing Copy")
+    assert len(messages.calls) == 2
+
+
+def test_analyze_many_keeps_order_and_isolates_failures(make_analyzer):
+    texts = ["first text", "second text", "third text"]
+
+    def reply(kwargs):
+        text = next(t for t in texts if t in kwargs["messages"][0]["content"])
+        if text == "second text":
+            raise RuntimeError("rate limited")
+        return json.dumps(dict(_ANALYSIS, overall_assessment=text))
+
+    analyzer, _ = make_analyzer(reply)
+    results = analyzer.analyze_many(texts, "Email")
+    assert [r["overall_assessment"] for r in results] == ["first text", "Analysis error: rate limited", "third text"]
+    assert analyzer.cache.get(analyzer._analysis_key("second text", "Email")) is None
+
+
+def test_generation_is_only_cached_at_temperature_zero(make_analyzer):
+    analyzer, messages = make_analyzer(lambda kwargs: f"  Draft at {kwargs['temperature']}  ")
+    streamed = []
+    assert analyzer.generate_text("Welcome email", "Email", temperature=0, on_text=streamed.append) == "Draft at 0"
+    assert streamed == ["  D", "  Draft at 0  "]
+    assert analyzer.generate_text("Welcome email", "Email", temperature=0) == "Draft at 0"
+    assert len(messages.calls) == 1
+    analyzer.generate_text("Welcome email", "Email", temperature=0.7)
+    analyzer.generate_text("Welcome email", "Email", temperature=0.7)
+    assert len(messages.calls) == 3